@@ -1,10 +1,16 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import re
 import shlex
 import subprocess
 
 from config import Config
 
+# Commands that never modify the filesystem or the working directory (when used without redirection),
+# and so can safely run concurrently.
+READ_ONLY_COMMANDS = frozenset({"ls", "cat", "find", "grep", "pwd", "head", "tail", "du", "wc"})
+# Arguments that make an otherwise read-only command write or execute things (e.g. `find -delete`)
+_UNSAFE_ARGUMENTS = ("-exec", "-execdir", "-ok", "-okdir", "-delete", "-fprint", "-fls")
+
 class Bash:
     """
     An implementation of a tool that executes bash commands and keeps track of the working directory.
@@ -14,6 +20,8 @@ class Bash:
         self.config = config
         # The current working directory (this is tracked and updated throughout the session)
         self.cwd = config.root_dir
+        # The tool schema never changes, so it is built once (see `to_json_schema`)
+        self._json_schema: Optional[Dict[str, Any]] = None
         # Set the initial working directory
         self.exec_bash_command(f"cd {self.cwd}")
 
@@ -35,10 +43,24 @@ class Bash:
 
         return {"error": "No command was provided"}
 
+    def is_read_only(self, cmd: str) -> bool:
+        """
+        Whether the command only reads from the filesystem (and can run concurrently with others).
+        """
+        if not cmd or re.search(r"[`$<>]", cmd) or any(arg in cmd for arg in _UNSAFE_ARGUMENTS):
+            return False
+        commands = self._split_commands(cmd)
+        return bool(commands) and all(c in READ_ONLY_COMMANDS for c in commands)
+
     def to_json_schema(self) -> Dict[str, Any]:
         """
         Convert the function signature to a JSON schema for LLM tool calling.
         """
+        if self._json_schema is None:
+            self._json_schema = self._build_json_schema()
+        return self._json_schema
+
+    def _build_json_schema(self) -> Dict[str, Any]:
         return {
             "type": "function",
             "function": {
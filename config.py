@@ -1,12 +1,18 @@
 import os
+from functools import cached_property
 from dataclasses import dataclass, field
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass  # python-dotenv not installed, skip
+# Load environment variables from .env file (only once per process, even if this module is re-imported)
+if not os.environ.get("_DOTENV_LOADED"):
+    try:
+        from dotenv import dotenv_values
+        # Variables that are already set in the environment take precedence
+        for key, value in dotenv_values().items():
+            if value is not None:
+                os.environ.setdefault(key, value)
+    except ImportError:
+        pass  # python-dotenv not installed, skip
+    os.environ["_DOTENV_LOADED"] = "1"
 
 @dataclass
 class Config:
@@ -24,10 +30,24 @@ class Config:
     # API key should be set in .env file as NVIDIA_API_KEY=your-key-here
     llm_base_url: str = "https://integrate.api.nvidia.com/v1"
     llm_model_name: str = "nvidia/nvidia-nemotron-nano-9b-v2"
-    llm_api_key: str = os.getenv("NVIDIA_API_KEY", "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")
+    llm_api_key: str = field(default_factory=lambda: os.getenv("NVIDIA_API_KEY", ""), repr=False)
     # Sampling parameters (we've reduced the temperature to make the model more deterministic)
     llm_temperature: float = 0.1
     llm_top_p: float = 0.95
+    # HTTP connection pool limits for the LLM client (connections are kept alive and reused across queries).
+    # The pool is shared by the whole process, so the limits of the first config that creates it apply.
+    llm_max_connections: int = 100
+    llm_max_keepalive: int = 20
+    # On-disk cache of LLM responses, kept in the user cache directory (outside of `root_dir`).
+    # Set LLM_CACHE_PATH to another file, or to "" to disable it. Only used when the temperature is at most
+    # `llm_cache_max_temperature`, since cached responses would hide the randomness of sampling.
+    llm_cache_path: str = field(default_factory=lambda: os.getenv("LLM_CACHE_PATH", os.path.join(
+        os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "bash-agent", "llm_cache.db",
+    )))
+    llm_cache_max_temperature: float = 0.3
+    # Cached responses expire after `llm_cache_ttl` seconds, and only the newest `llm_cache_max_entries` are kept
+    llm_cache_ttl: float = 7 * 24 * 60 * 60
+    llm_cache_max_entries: int = 1000
 
     # -------------------------------------
     # Agent configuration
@@ -41,13 +61,21 @@ class Config:
     # WARNING: Be very careful about which commands you allow here.
     #          By running this code you assume all responsibility for
     #          unintended consequences of command execution.
-    allowed_commands: list = field(default_factory=lambda: [
+    allowed_commands: frozenset = frozenset({
         "cd", "cp", "ls", "cat", "find", "touch", "echo", "grep", "pwd", "mkdir", "wget", "sort", "head", "tail", "du", "wc",
-    ])
+    })
 
-    @property
+    def __post_init__(self):
+        # Fail fast on a missing/malformed key for the hosted service (self-hosted endpoints may not need one)
+        if "api.nvidia.com" in self.llm_base_url and not self.llm_api_key.startswith("nvapi-"):
+            raise ValueError(
+                "A valid NVIDIA API key (starting with 'nvapi-') is required. "
+                "Set NVIDIA_API_KEY in your environment or .env file."
+            )
+
+    @cached_property
     def system_prompt(self) -> str:
-        """Generate the system prompt for the LLM based on allowed commands."""
+        """Generate the system prompt for the LLM based on allowed commands (computed once)."""
         return f"""/think
 
 You are a helpful and very concise Bash assistant with the ability to execute commands in the shell.
@@ -65,7 +93,7 @@ If there was an error during execution, tell the user what that error was exactl
 You are only allowed to execute the following commands. Break complex tasks into shorter commands from this list:
 
 ```
-{self.allowed_commands}
+{sorted(self.allowed_commands)}
 ```
 
 **Never** attempt to execute a command not in this list. **Never** attempt to execute dangerous commands
@@ -1,30 +1,93 @@
-from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import threading
 from openai import OpenAI
 from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 from config import Config
+from http_client import get_http_client
+
+# Prefer orjson for (de)serializing tool arguments and results, if available.
+# Its decode error subclasses json.JSONDecodeError, so callers can catch either.
+try:
+    import orjson
+
+    json_loads = orjson.loads
+
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+class Msg:
+    """
+    A single (compact) message of the conversation.
+    """
+
+    __slots__ = ("role", "content", "tool_call_id", "_dict")
+
+    def __init__(self, role: str, content: str, tool_call_id: Optional[str] = None):
+        self.role = role
+        self.content = content
+        self.tool_call_id = tool_call_id
+        self._dict: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert to an OpenAI-shaped message dictionary (built once, then reused).
+        """
+        if self._dict is None:
+            self._dict = {"role": self.role, "content": self.content}
+            if self.role == "tool":
+                self._dict["tool_call_id"] = self.tool_call_id
+        return self._dict
 
 class Messages:
     """
     An abstraction for a list of system/user/assistant/tool messages.
+
+    To bound the context size, long tool outputs are truncated to their head and tail, and only the
+    most recent `max_history` messages (plus the first user message, if it was evicted) are kept and
+    sent to the LLM.
     """
 
-    def __init__(self, system_message: str = ""):
-        self.system_message: Optional[Dict[str, str]] = None
-        self.messages: List[Dict[str, Any]] = []
+    def __init__(self, system_message: str = "", max_tool_chars: int = 4000, max_history: int = 40):
+        self.system_message: Optional[Msg] = None
+        self.first_user_message: Optional[Msg] = None
+        self.messages: Deque[Msg] = deque(maxlen=max_history)
+        self.max_tool_chars = max_tool_chars
+        self.max_history = max_history
         self.set_system_message(system_message)
 
     def set_system_message(self, message):
-        self.system_message = {"role": "system", "content": message}
+        self.system_message = Msg("system", message)
 
     def add_user_message(self, message):
-        self.messages.append({"role": "user", "content": message})
+        msg = Msg("user", message)
+        if self.first_user_message is None:
+            self.first_user_message = msg
+        self.messages.append(msg)
 
     def add_assistant_message(self, message):
-        self.messages.append({"role": "assistant", "content": message})
+        self.messages.append(Msg("assistant", message))
 
     def add_tool_message(self, message, id):
-        self.messages.append({"role": "tool", "content": str(message), "tool_call_id": id})
+        # Serialize results as JSON (not Python repr), so the LLM sees valid JSON
+        content = message if isinstance(message, str) else json_dumps(message)
+        if len(content) > self.max_tool_chars:
+            # Keep the head and the tail of long outputs
+            half = self.max_tool_chars // 2
+            content = f"{content[:half]}…[truncated {len(content) - 2 * half} chars]…{content[-half:]}"
+        self.messages.append(Msg("tool", content, id))
 
     def to_list(self) -> List[Dict[str, Any]]:
         """
@@ -32,8 +95,18 @@ class Messages:
         """
         result = []
         if self.system_message:
-            result.append(self.system_message)
-        result.extend(self.messages)
+            result.append(self.system_message.to_dict())
+
+        window = list(self.messages)
+        if self.first_user_message is not None and self.first_user_message not in self.messages:
+            # Older messages were evicted: don't start on a tool message, so it isn't separated from its
+            # tool call. If only tool messages are left (a long run of tool calls), keep them all.
+            start = next((i for i, m in enumerate(window) if m.role != "tool"), 0)
+            window = window[start:]
+            # Always keep the first user message, as it usually states the overall task
+            result.append(self.first_user_message.to_dict())
+
+        result.extend(m.to_dict() for m in window)
         return result
 
 class LLM:
@@ -42,27 +115,187 @@ class LLM:
     """
 
     def __init__(self, config: Config):
-        self.client = OpenAI(base_url=config.llm_base_url, api_key=config.llm_api_key)
+        # The shared, pooled HTTP client, so that consecutive queries reuse warm TCP/TLS connections
+        self.http_client = get_http_client(config)
+        self.client = OpenAI(
+            base_url=config.llm_base_url,
+            api_key=config.llm_api_key,
+            http_client=self.http_client,
+        )
         self.config = config
         print(f"Using model '{config.llm_model_name}' from '{config.llm_base_url}'")
+        # An on-disk cache of responses, to skip identical queries (only for near-deterministic sampling)
+        self.cache: Optional[sqlite3.Connection] = None
+        if config.llm_cache_path and config.llm_temperature <= config.llm_cache_max_temperature:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(config.llm_cache_path)), exist_ok=True)
+                # A short lock timeout: when the cache is busy, it's faster to just query the LLM
+                self.cache = sqlite3.connect(config.llm_cache_path, timeout=1.0, check_same_thread=False)
+                self.cache.execute("PRAGMA journal_mode=WAL")
+                self.cache.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_responses "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+            except (OSError, sqlite3.Error) as e:
+                # The cache is an optimization only, so run without it
+                print(f"[WARNING] LLM response cache disabled: {e}")
+                if self.cache is not None:
+                    self.cache.close()
+                self.cache = None
+        self._cache_warned = False
+        # Establish the connection in the background, so the first query doesn't pay for the handshake
+        threading.Thread(target=self._prewarm, daemon=True).start()
+
+    def _prewarm(self):
+        """
+        Open a connection to the endpoint ahead of the first query (errors are ignored).
+        """
+        try:
+            self.client.models.list()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Close the response cache. The shared HTTP connection pool is closed at process exit,
+        as other clients may still be using it.
+        """
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self) -> "LLM":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def query(
         self,
         messages: Messages,
         tools: List[Dict[str, Any]],
         max_tokens=None,
+    ) -> Tuple[Optional[str], List[ChatCompletionMessageToolCall]]:
+        message_list = messages.to_list()
+        if self.cache is None:
+            return self._query(message_list, tools, max_tokens)
+
+        key = self._cache_key(message_list, tools, max_tokens)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        content, tool_calls = self._query(message_list, tools, max_tokens)
+        self._cache_put(key, content, tool_calls)
+        return content, tool_calls
+
+    def _cache_get(self, key: str) -> Optional[Tuple[Optional[str], List[ChatCompletionMessageToolCall]]]:
+        """
+        Look up a (non-expired) cached response. Cache errors are treated as a miss.
+        """
+        assert self.cache is not None
+        try:
+            row = self.cache.execute(
+                "SELECT value FROM llm_responses WHERE key = ? AND created >= ?",
+                (key, time.time() - self.config.llm_cache_ttl),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._warn_cache_error(e)
+            return None
+        if not row:
+            return None
+        cached = json_loads(row[0])
+        return (
+            cached["content"],
+            [ChatCompletionMessageToolCall.model_validate(tc) for tc in cached["tool_calls"]],
+        )
+
+    def _cache_put(self, key: str, content: Optional[str], tool_calls: List[ChatCompletionMessageToolCall]):
+        """
+        Store a response, dropping expired entries and the oldest ones beyond the size limit.
+        Cache errors are ignored (after a warning).
+        """
+        assert self.cache is not None
+        value = json_dumps({"content": content, "tool_calls": [tc.model_dump() for tc in tool_calls]})
+        now = time.time()
+        try:
+            with self.cache:
+                self.cache.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+                self.cache.execute(
+                    "DELETE FROM llm_responses WHERE created < ? OR key NOT IN "
+                    "(SELECT key FROM llm_responses ORDER BY created DESC LIMIT ?)",
+                    (now - self.config.llm_cache_ttl, self.config.llm_cache_max_entries),
+                )
+        except sqlite3.Error as e:
+            self._warn_cache_error(e)
+
+    def _warn_cache_error(self, error: sqlite3.Error):
+        if not self._cache_warned:
+            print(f"[WARNING] LLM response cache unavailable, querying the LLM directly: {error}")
+            self._cache_warned = True
+
+    def _cache_key(self, message_list: List[Dict[str, Any]], tools: List[Dict[str, Any]], max_tokens) -> str:
+        """
+        A stable hash of everything that determines the response.
+        """
+        payload = json_dumps([
+            message_list,
+            tools,
+            self.config.llm_model_name,
+            self.config.llm_temperature,
+            self.config.llm_top_p,
+            max_tokens,
+        ])
+        return hashlib.blake2b(payload.encode(), digest_size=32).hexdigest()
+
+    def _query(
+        self,
+        message_list: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        max_tokens=None,
     ) -> Tuple[Optional[str], List[ChatCompletionMessageToolCall]]:
         completion = self.client.chat.completions.create(
             model=self.config.llm_model_name,
-            messages=messages.to_list(),  # type: ignore
+            messages=message_list,  # type: ignore
             tools=tools,  # type: ignore
             temperature=self.config.llm_temperature,
             top_p=self.config.llm_top_p,
             max_tokens=max_tokens,
-            stream=False
+            stream=True
         )
 
+        # Accumulate the streamed deltas (tool calls arrive in fragments, keyed by their index)
+        content_parts: List[str] = []
+        tool_call_parts: Dict[int, Dict[str, Any]] = {}
+        for chunk in completion:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+            for tc in delta.tool_calls or []:
+                parts = tool_call_parts.setdefault(tc.index, {"id": None, "name": [], "arguments": []})
+                if tc.id:
+                    parts["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        parts["name"].append(tc.function.name)
+                    if tc.function.arguments:
+                        parts["arguments"].append(tc.function.arguments)
+
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=parts["id"] or "",
+                type="function",
+                function=Function(name="".join(parts["name"]), arguments="".join(parts["arguments"])),
+            )
+            for _, parts in sorted(tool_call_parts.items())
+        ]
+
         return (
-            completion.choices[0].message.content,
-            completion.choices[0].message.tool_calls or [],
-        )
\ No newline at end of file
+            "".join(content_parts) if content_parts else None,
+            tool_calls,
+        )
@@ -0,0 +1,44 @@
+from typing import Optional
+import atexit
+import threading
+import httpx
+
+from config import Config
+
+# The HTTP client shared by all the LLM clients in this process (created on first use)
+_shared_http: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+def get_http_client(config: Config) -> httpx.Client:
+    """
+    Get the shared, pooled HTTP client, so that all LLM clients reuse the same warm TCP/TLS connections.
+
+    The pool limits (`llm_max_connections`, `llm_max_keepalive`) are taken from the config of the first
+    caller; later calls return the existing client and ignore their config's limits.
+    """
+    global _shared_http
+    with _lock:
+        if _shared_http is None or _shared_http.is_closed:
+            _shared_http = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.llm_max_connections,
+                    max_keepalive_connections=config.llm_max_keepalive,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                http2=True,
+            )
+        return _shared_http
+
+def close_http_client():
+    """
+    Close the shared HTTP client (a new one is created on the next `get_http_client` call).
+    This is called at process exit; closing it earlier breaks every client still holding it.
+    """
+    global _shared_http
+    with _lock:
+        if _shared_http is not None:
+            _shared_http.close()
+            _shared_http = None
+
+atexit.register(close_http_client)
@@ -1,12 +1,40 @@
 import json
-import re
+import logging
+import os
 import sys
 import select
-import traceback
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from config import Config
 from bash import Bash
-from helpers import Messages, LLM
+from helpers import Messages, LLM, json_loads
+
+log = logging.getLogger(__name__)
+
+# The maximum number of read-only commands that are executed concurrently
+MAX_PARALLEL_COMMANDS = 4
+
+# Whether stdin is a terminal (checked once, rather than on every prompt)
+STDIN_IS_TTY = sys.stdin.isatty()
+
+def _alarm_timeout_handler(signum, frame):
+    raise TimeoutError()
+
+def _alarm_input(prompt: str, timeout: float) -> str:
+    """
+    Get user input, interrupted by SIGALRM after the timeout (POSIX and main thread only).
+    Raises TimeoutError if no input was received in time.
+    """
+    previous_handler = signal.signal(signal.SIGALRM, _alarm_timeout_handler)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return input(prompt)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
 
 def input_with_timeout(prompt: str, timeout: float = 30.0) -> str:
     """
@@ -20,16 +48,27 @@ def input_with_timeout(prompt: str, timeout: float = 30.0) -> str:
         User input string, or empty string if timeout occurred
     """
     # Check if stdin is a TTY (terminal), otherwise fall back to regular input
-    if not sys.stdin.isatty():
+    if not STDIN_IS_TTY:
         # Not a TTY, use regular input (e.g., when piped or redirected)
         try:
             return input(prompt).strip()
         except (EOFError, KeyboardInterrupt):
             return ""
-    
+
+    # Use SIGALRM to interrupt the blocking input (Unix/Linux/WSL). Signal handlers can only be
+    # installed from the main thread, so other threads use the select path below.
+    if os.name != "nt" and threading.current_thread() is threading.main_thread():
+        try:
+            return _alarm_input(prompt, timeout).strip()
+        except TimeoutError:
+            print("\n[⏱️] No input received within timeout period.")
+            return ""
+        except (EOFError, KeyboardInterrupt):
+            return ""
+
     print(prompt, end='', flush=True)
-    
-    # Use select to check if input is available (Unix/Linux/WSL)
+
+    # Otherwise (Windows, or not the main thread), use select to check if input is available
     try:
         if select.select([sys.stdin], [], [], timeout)[0]:
             try:
@@ -41,8 +80,7 @@ def input_with_timeout(prompt: str, timeout: float = 30.0) -> str:
             print("\n[⏱️] No input received within timeout period.")
             return ""
     except (OSError, ValueError):
-        # Fallback if select doesn't work (e.g., on Windows without WSL)
-        # This shouldn't happen on WSL, but provides a safety net
+        # Fallback if select doesn't work on stdin (e.g., on Windows without WSL)
         try:
             return input().strip()
         except (EOFError, KeyboardInterrupt):
@@ -53,14 +91,67 @@ def fix_json_escaping(json_str: str) -> str:
     Attempt to fix common JSON escaping issues, particularly with backslashes
     before semicolons in bash commands (e.g., backslash-semicolon should be double-backslash-semicolon in JSON).
     """
+    # Fast path: nothing to fix (the common case)
+    if "\\;" not in json_str:
+        return json_str
+
     # Fix common issue: \; should be \\; in JSON strings
-    # Pattern: find backslash-semicolon sequences that aren't properly escaped
     # We'll look for patterns like: -exec ... {} \;
     # And change \; to \\; but only if it's not already escaped (not \\;)
-    # Use a negative lookbehind to ensure we don't double-escape
-    backslash_semicolon = re.compile(r'(?<![\\])\\(?=;)')
-    fixed = backslash_semicolon.sub(r'\\\\', json_str)
-    return fixed
+    parts = []
+    start = 0
+    pos = json_str.find("\\;")
+    while pos != -1:
+        if pos == 0 or json_str[pos - 1] != "\\":
+            parts.append(json_str[start:pos])
+            parts.append("\\")
+            start = pos
+        pos = json_str.find("\\;", pos + 2)
+    parts.append(json_str[start:])
+    return "".join(parts)
+
+def parse_tool_arguments(arguments_str: str) -> Dict[str, Any]:
+    """
+    Parse the JSON arguments of a tool call, short-circuiting empty arguments.
+    """
+    if arguments_str in ("", "{}"):
+        return {}
+    return json_loads(arguments_str)
+
+def execute_command(bash: Bash, command: str) -> Dict[str, str]:
+    """
+    Execute a single command from a tool call and print a summary of its outcome.
+    """
+    # Execute command directly (allowlist validation happens in bash.exec_bash_command)
+    print(f"    ▶️   Executing: {command}")
+    try:
+        tool_call_result = bash.exec_bash_command(command)
+    except Exception as e:
+        error_msg = f"Unexpected error executing command: {type(e).__name__}: {str(e)}"
+        log.debug("command execution failed", exc_info=True)
+        tool_call_result = {"error": error_msg}
+
+    # Print a summary if there was an error
+    if "error" in tool_call_result:
+        print(f"    ✗   Command failed: {tool_call_result['error']}")
+    elif tool_call_result.get("stderr"):
+        print(f"    ⚠️   Command produced stderr: {tool_call_result['stderr'][:100]}")
+    else:
+        # Show a brief success message for long outputs
+        stdout_len = len(tool_call_result.get("stdout", ""))
+        if stdout_len > 1000:
+            print(f"    ✓   Command executed successfully ({stdout_len} chars of output)")
+    return tool_call_result
+
+def execute_commands(bash: Bash, commands: List[str]) -> List[Dict[str, str]]:
+    """
+    Execute the commands of a turn, returning their results in order.
+    Read-only commands run concurrently; anything else runs serially, as it may depend on earlier commands.
+    """
+    if len(commands) > 1 and all(bash.is_read_only(command) for command in commands):
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_COMMANDS) as executor:
+            return list(executor.map(lambda command: execute_command(bash, command), commands))
+    return [execute_command(bash, command) for command in commands]
 
 def main(config: Config):
     bash = Bash(config)
@@ -68,128 +159,132 @@ def main(config: Config):
     llm = LLM(config)
     # The conversation history, with the system prompt
     messages = Messages(config.system_prompt)
+    # The tool schema is constant, so build it once for all queries
+    tools = [bash.to_json_schema()]
     print("[INFO] Type 'quit' at any time to exit the agent loop.")
     print("[INFO] Agent will auto-shutdown after 30 seconds of inactivity.\n")
 
-    # The main agent loop
-    while True:
-        # Get user message with timeout (30 seconds after agent output)
-        user = input_with_timeout(f"['{bash.cwd}' 🙂] ", timeout=30.0).strip()
+    try:
+        # The main agent loop
+        while True:
+            # Get user message with timeout (30 seconds after agent output)
+            user = input_with_timeout(f"['{bash.cwd}' 🙂] ", timeout=30.0).strip()
         
-        # Check if timeout occurred (empty string returned)
-        if not user:
-            print("\n[🤖] Shutting down due to inactivity timeout (30 seconds).\n")
-            break
+            # Check if timeout occurred (empty string returned)
+            if not user:
+                print("\n[🤖] Shutting down due to inactivity timeout (30 seconds).\n")
+                break
             
-        if user.lower() == "quit":
-            print("\n[🤖] Shutting down. Bye!\n")
-            break
-        if not user:
-            continue
-        # Always tell the agent where the current working directory is to avoid confusions.
-        user += f"\n Current working directory: `{bash.cwd}`"
-        messages.add_user_message(user)
-
-        # The tool-call/response loop
-        while True:
-            print("\n[🤖] Thinking...")
-            response, tool_calls = llm.query(messages, [bash.to_json_schema()])
+            if user.lower() == "quit":
+                print("\n[🤖] Shutting down. Bye!\n")
+                break
+            if not user:
+                continue
+            # Always tell the agent where the current working directory is to avoid confusions.
+            user += f"\n Current working directory: `{bash.cwd}`"
+            messages.add_user_message(user)
 
-            if response:
-                response = response.strip()
-                # Do not store the thinking part to save context space
-                if "</think>" in response:
-                    response = response.split("</think>")[-1].strip()
+            # The tool-call/response loop
+            while True:
+                print("\n[🤖] Thinking...")
+                response, tool_calls = llm.query(messages, tools)
 
-                # Add the (non-empty) response to the context
                 if response:
-                    messages.add_assistant_message(response)
+                    response = response.strip()
+                    # Do not store the thinking part to save context space
+                    _, sep, tail = response.rpartition("</think>")
+                    if sep:
+                        response = tail.strip()
+
+                    # Add the (non-empty) response to the context
+                    if response:
+                        messages.add_assistant_message(response)
 
-            # Process tool calls
-            if tool_calls:
-                for tc in tool_calls:
-                    try:
-                        # Safely access tool call ID
+                # Process tool calls
+                if tool_calls:
+                    # The result of each tool call (in order), and the commands that still need to be executed
+                    results: List[Tuple[Optional[str], Dict[str, str]]] = []
+                    commands: List[Tuple[int, str]] = []
+                    for tc in tool_calls:
+                        # Safely access the tool call attributes (once)
                         tool_call_id = getattr(tc, 'id', None)
+                        function = getattr(tc, 'function', None)
+                        function_name = getattr(function, 'name', None)
+                        arguments_str = getattr(function, 'arguments', None)
+                        try:
+                            if not function_name:
+                                tool_call_result = {"error": "Tool call missing function name"}
+                                results.append((tool_call_id, tool_call_result))
+                                continue
                         
-                        # Safely access tool call attributes
-                        function_name = getattr(tc.function, 'name', None)
-                        if not function_name:
-                            tool_call_result = {"error": "Tool call missing function name"}
-                            messages.add_tool_message(tool_call_result, tool_call_id)
-                            continue
-                        
-                        # Parse JSON arguments with error handling and auto-fix
-                        function_args = None
-                        arguments_str = getattr(tc.function, 'arguments', None)
-                        if arguments_str is None:
-                            tool_call_result = {"error": "Tool call missing arguments"}
-                            messages.add_tool_message(tool_call_result, tool_call_id)
-                            continue
+                            # Parse JSON arguments with error handling and auto-fix
+                            function_args = None
+                            if arguments_str is None:
+                                tool_call_result = {"error": "Tool call missing arguments"}
+                                results.append((tool_call_id, tool_call_result))
+                                continue
                         
-                        try:
-                            function_args = json.loads(arguments_str)
-                        except json.JSONDecodeError as e:
-                            # Try to fix common escaping issues
-                            print(f"    ⚠️   JSON parse failed, attempting to fix escaping...")
                             try:
-                                fixed_arguments = fix_json_escaping(arguments_str)
-                                function_args = json.loads(fixed_arguments)
-                                print(f"    ⚠️   Fixed JSON escaping issue in tool arguments")
-                            except (json.JSONDecodeError, Exception) as fix_error:
-                                # If fixing didn't work, return a clear error
-                                error_msg = (
-                                    f"Failed to parse tool arguments as JSON: {str(e)}. "
-                                    f"Attempted fix also failed: {str(fix_error)}. "
-                                    f"This usually happens when the command contains special characters. "
-                                    f"Arguments (first 200 chars): {arguments_str[:200]}"
-                                )
-                                print(f"    ✗   {error_msg}")
-                                tool_call_result = {"error": error_msg}
-                                messages.add_tool_message(tool_call_result, tool_call_id)
-                                continue
+                                function_args = parse_tool_arguments(arguments_str)
+                            except json.JSONDecodeError as e:
+                                # Try to fix common escaping issues
+                                print(f"    ⚠️   JSON parse failed, attempting to fix escaping...")
+                                try:
+                                    fixed_arguments = fix_json_escaping(arguments_str)
+                                    function_args = parse_tool_arguments(fixed_arguments)
+                                    print(f"    ⚠️   Fixed JSON escaping issue in tool arguments")
+                                except (json.JSONDecodeError, Exception) as fix_error:
+                                    # If fixing didn't work, return a clear error
+                                    error_msg = (
+                                        f"Failed to parse tool arguments as JSON: {str(e)}. "
+                                        f"Attempted fix also failed: {str(fix_error)}. "
+                                        f"This usually happens when the command contains special characters. "
+                                        f"Arguments (first 200 chars): {arguments_str[:200]}"
+                                    )
+                                    print(f"    ✗   {error_msg}")
+                                    tool_call_result = {"error": error_msg}
+                                    results.append((tool_call_id, tool_call_result))
+                                    continue
 
-                        # Ensure it's calling the right tool
-                        if function_args is None:
-                            tool_call_result = {"error": "Failed to parse function arguments"}
-                            messages.add_tool_message(tool_call_result, tool_call_id)
-                        elif function_name != "exec_bash_command" or "cmd" not in function_args:
-                            tool_call_result = {"error": "Incorrect tool or function argument"}
-                            messages.add_tool_message(tool_call_result, tool_call_id)
-                        else:
-                            command = function_args["cmd"]
-                            # Execute command directly (allowlist validation happens in bash.exec_bash_command)
-                            print(f"    ▶️   Executing: {command}")
-                            tool_call_result = bash.exec_bash_command(command)
-                            messages.add_tool_message(tool_call_result, tool_call_id)
-                            
-                            # Print a summary if there was an error
-                            if "error" in tool_call_result:
-                                print(f"    ✗   Command failed: {tool_call_result['error']}")
-                            elif tool_call_result.get("stderr"):
-                                print(f"    ⚠️   Command produced stderr: {tool_call_result['stderr'][:100]}")
+                            # Ensure it's calling the right tool
+                            if function_args is None:
+                                tool_call_result = {"error": "Failed to parse function arguments"}
+                                results.append((tool_call_id, tool_call_result))
+                            elif function_name != "exec_bash_command" or "cmd" not in function_args:
+                                tool_call_result = {"error": "Incorrect tool or function argument"}
+                                results.append((tool_call_id, tool_call_result))
                             else:
-                                # Show a brief success message for long outputs
-                                stdout_len = len(tool_call_result.get("stdout", ""))
-                                if stdout_len > 1000:
-                                    print(f"    ✓   Command executed successfully ({stdout_len} chars of output)")
-                    except Exception as e:
-                        # Catch any unexpected errors during tool call processing
-                        error_msg = f"Unexpected error processing tool call: {type(e).__name__}: {str(e)}"
-                        print(f"    ✗   {error_msg}")
-                        traceback.print_exc()
-                        tool_call_result = {"error": error_msg}
-                        # Safely get tool call ID for error message
-                        tool_call_id = getattr(tc, 'id', None) if 'tc' in locals() else None
+                                # Execution is deferred, so that read-only commands can run concurrently
+                                commands.append((len(results), function_args["cmd"]))
+                                results.append((tool_call_id, {}))
+                        except Exception as e:
+                            # Catch any unexpected errors during tool call processing
+                            error_msg = f"Unexpected error processing tool call: {type(e).__name__}: {str(e)}"
+                            print(f"    ✗   {error_msg}")
+                            log.debug("tool call failed", exc_info=True)
+                            tool_call_result = {"error": error_msg}
+                            results.append((tool_call_id, tool_call_result))
+
+                    # Execute the commands, and add all the results to the context in the original order
+                    for (index, _), tool_call_result in zip(commands, execute_commands(bash, [c for _, c in commands])):
+                        results[index] = (results[index][0], tool_call_result)
+                    for tool_call_id, tool_call_result in results:
                         messages.add_tool_message(tool_call_result, tool_call_id)
-            else:
-                # Display the assistant's message to the user.
-                if response:
-                    print(response)
-                    print("-" * 80 + "\n")
-                break
+                else:
+                    # Display the assistant's message to the user.
+                    if response:
+                        print(response)
+                        print("-" * 80 + "\n")
+                    break
+    finally:
+        # Release the LLM's resources, even if the loop exits on an error
+        llm.close()
 
 if __name__ == "__main__":
+    # Keep other libraries (e.g. httpx) quiet; tracebacks of failed tool calls are only shown with AGENT_LOG_LEVEL=DEBUG
+    logging.basicConfig(level=logging.WARNING)
+    log_level = logging.getLevelName(os.getenv("AGENT_LOG_LEVEL", "INFO").upper())
+    log.setLevel(log_level if isinstance(log_level, int) else logging.INFO)
     # Load the configuration
     config = Config()
     main(config)
\ No newline at end of file
@@ -1,15 +1,28 @@
-from typing import Dict
-try:
-    from langchain.agents import create_agent  # New import (LangGraph V1.0+)
-except ImportError:
-    from langgraph.prebuilt import create_react_agent as create_agent  # Fallback for older versions
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_openai import ChatOpenAI
+from typing import Any, Dict, Tuple
+import hashlib
+import uuid
 
 from config import Config
 from bash import Bash
+from http_client import get_http_client
+
+# Agents (with their LLM client and bash tool) are reused across `main()` calls with the same configuration.
+# Each `main()` call still gets its own conversation thread and starts from `root_dir`.
+_AGENT_POOL: Dict[tuple, Tuple[Any, Bash]] = {}
+
+def _create_agent(config: Config) -> Tuple[Any, Bash]:
+    """
+    Create the agent, along with the bash tool it operates.
+    """
+    # LangChain/LangGraph are heavy to import, so they are only imported once an agent is needed
+    # (repeated imports are served from `sys.modules`).
+    try:
+        from langchain.agents import create_agent  # New import (LangGraph V1.0+)
+    except ImportError:
+        from langgraph.prebuilt import create_react_agent as create_agent  # Fallback for older versions
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langchain_openai import ChatOpenAI
 
-def main(config: Config):
     # Create the client
     llm = ChatOpenAI(
         model=config.llm_model_name,
@@ -17,6 +30,7 @@ def main(config: Config):
         api_key=config.llm_api_key,  # type: ignore
         temperature=config.llm_temperature,
         top_p=config.llm_top_p,
+        http_client=get_http_client(config),
     )
     # Create the tool
     bash = Bash(config)
@@ -34,6 +48,37 @@ def main(config: Config):
         prompt=config.system_prompt,
         checkpointer=InMemorySaver(),
     )
+    return agent, bash
+
+def get_agent(config: Config) -> Tuple[Any, Bash]:
+    """
+    Get the pooled agent for this configuration, creating it on first use.
+    """
+    key = (
+        config.llm_model_name,
+        config.llm_base_url,
+        config.llm_temperature,
+        config.llm_top_p,
+        # A hash of the API key, so that different keys don't share a client (without keeping the key itself)
+        hashlib.sha256(config.llm_api_key.encode()).hexdigest(),
+        config.root_dir,
+        frozenset(config.allowed_commands),
+    )
+    if key not in _AGENT_POOL:
+        _AGENT_POOL[key] = _create_agent(config)
+    return _AGENT_POOL[key]
+
+def release_agents():
+    """
+    Drop all the pooled agents.
+    """
+    _AGENT_POOL.clear()
+
+def main(config: Config):
+    agent, bash = get_agent(config)
+    # Don't carry over the state of a previous run of a pooled agent
+    bash.cwd = config.root_dir
+    thread_id = uuid.uuid4().hex
     print("[INFO] Type 'quit' at any time to exit the agent loop.\n")
 
     # The main loop
@@ -53,7 +98,7 @@ def main(config: Config):
         # Run the agent's logic and get the response.
         result = agent.invoke(
             {"messages": [{"role": "user", "content": user}]},
-            config={"configurable": {"thread_id": "cli"}},  # one ongoing conversation
+            config={"configurable": {"thread_id": thread_id}},  # one ongoing conversation per `main()` call
         )
         # Show the response (without the thinking part, if any)
         if not result.get("messages") or not result["messages"][-1].content:
@@ -63,8 +108,9 @@ def main(config: Config):
         
         response = result["messages"][-1].content.strip()
 
-        if "</think>" in response:
-            response = response.split("</think>")[-1].strip()
+        _, sep, tail = response.rpartition("</think>")
+        if sep:
+            response = tail.strip()
 
         if response:
             print(response)